@@ -2,11 +2,15 @@ import os
 import time
 import sqlite3
 import requests
-import schedule
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
+from urllib3.util.retry import Retry
+import ijson
 import logging
 import threading
 import qbittorrentapi
-from datetime import datetime, timedelta
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # ==========================================
 #       CONFIGURATION & ENVIRONMENT
@@ -96,6 +100,45 @@ SONARR_CUTOFF = int(os.getenv("SONARR_CUTOFF_LIMIT", "0"))
 RADARR_LIMIT = int(os.getenv("RADARR_LIMIT", "10"))
 RADARR_CUTOFF = int(os.getenv("RADARR_CUTOFF_LIMIT", "0"))
 
+# Smallest wanted/* page requested while looking for unsearched items
+MIN_PAGE_SIZE = 250
+
+# --- Searcher Endpoints (built once; page/pageSize are added per request) ---
+def _search_app(url, key, limit, cutoff, api_version, missing_query, lean_query, command, id_field):
+    """Prebuild one Arr's searcher config: wanted/* URLs (+cutoff if enabled) and command details."""
+    def with_query(path, *parts):
+        query = "&".join(p for p in parts if p)
+        return f"{url}/api/{api_version}/{path}" + (f"?{query}" if query else "")
+    endpoints = [with_query("wanted/missing", missing_query, lean_query)]
+    if cutoff > 0:
+        endpoints.append(with_query("wanted/cutoff", lean_query))
+    return {
+        'key': key, 'limit': limit, 'endpoints': endpoints,
+        'command_url': f"{url}/api/{api_version}/command", 'command': command, 'id_field': id_field,
+    }
+
+# lean_query: we only read records[].id, so ask the Arr not to embed parent objects,
+# images or file info in each record (much smaller payloads).
+SEARCH_APPS = {}
+if SONARR_ENABLED:
+    # Sonarr uses airDateUtc
+    SEARCH_APPS["Sonarr"] = _search_app(
+        SONARR_URL, SONARR_API_KEY, SONARR_LIMIT, SONARR_CUTOFF, "v3",
+        "sortKey=airDateUtc&sortDir=desc", "includeSeries=false&includeEpisodeFile=false&includeImages=false",
+        'EpisodeSearch', 'episodeIds')
+if RADARR_ENABLED:
+    # Radarr uses standard logic (records are plain movies, nothing to strip)
+    SEARCH_APPS["Radarr"] = _search_app(
+        RADARR_URL, RADARR_API_KEY, RADARR_LIMIT, RADARR_CUTOFF, "v3",
+        "", "",
+        'MoviesSearch', 'movieIds')
+if LIDARR_ENABLED:
+    # Lidarr uses API v1 and releaseDate (Not airDateUtc)
+    SEARCH_APPS["Lidarr"] = _search_app(
+        LIDARR_URL, LIDARR_API_KEY, LIDARR_LIMIT, LIDARR_CUTOFF, "v1",
+        "sortKey=releaseDate&sortDir=desc", "includeArtist=false",
+        'AlbumSearch', 'albumIds')
+
 # ==========================================
 #           LOGGING & DATABASE
 # ==========================================
@@ -106,114 +149,212 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Single long-lived connection shared by the Searcher & Cleaner threads.
+# Opened lazily on first use; every access goes through _db_lock.
+_conn = None
+_db_lock = threading.Lock()
+
+def _connect():
+    """Open a SQLite connection with the performance PRAGMAs applied."""
+    # isolation_level=None -> autocommit, each statement is its own transaction
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+    # WAL + synchronous=NORMAL: one fsync per checkpoint instead of per commit,
+    # and readers no longer block the writer (Searcher & Cleaner share the DB).
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-16000")  # 16MB page cache
+    conn.execute("PRAGMA mmap_size=268435456")  # 256MB
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+def _db():
+    """Return the shared connection, opening it on first use. Caller must hold _db_lock."""
+    global _conn
+    if _conn is None:
+        _conn = _connect()
+    return _conn
+
+SEARCH_TABLES = ("sonarr_searches", "radarr_searches", "lidarr_searches", "bazarr_searches")
+
+def _migrate_timestamps(conn, table_name):
+    """Convert a table's ISO-8601 TEXT timestamps (pre-index schema) to INTEGER epoch seconds."""
+    cols = conn.execute(f"PRAGMA table_info({table_name})").fetchall()
+    if not any(col[1] == 'timestamp' and col[2].upper() == 'TEXT' for col in cols): return
+    logger.info(f"Migrating {table_name} timestamps to epoch seconds...")
+    conn.execute("BEGIN")
+    try:
+        conn.execute(f"ALTER TABLE {table_name} RENAME TO {table_name}_old")
+        conn.execute(f"CREATE TABLE {table_name} (id INTEGER PRIMARY KEY, timestamp INTEGER)")
+        # Old values are naive local time; reading them as UTC is off by at most the TZ offset.
+        conn.execute(f"""INSERT INTO {table_name} (id, timestamp)
+                         SELECT id, COALESCE(CAST(strftime('%s', timestamp) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER))
+                         FROM {table_name}_old""")
+        conn.execute(f"DROP TABLE {table_name}_old")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+# Full schema, applied in a single executescript() pass.
+# Searcher tables: timestamp is epoch seconds, indexed so the Safety Net check is a single index probe.
+# Cleaner table (Persistent Strikes): hash = Torrent Hash, strikes = Current strike count,
+# last_checked = Timestamp of last check, reason = Why it got the last strike.
+_SCHEMA = "".join(
+    f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, timestamp INTEGER);\n"
+    f"CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table}(timestamp);\n"
+    for table in SEARCH_TABLES
+) + "CREATE TABLE IF NOT EXISTS torrent_strikes (hash TEXT PRIMARY KEY, strikes INTEGER, last_checked TEXT, reason TEXT);\n"
+
 def init_db():
     """Initialize SQLite tables for both Searcher history and Cleaner strikes."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        
-        # 1. Searcher Tables (Updated to include Lidarr/Bazarr)
-        c.execute('''CREATE TABLE IF NOT EXISTS sonarr_searches (id INTEGER PRIMARY KEY, timestamp TEXT)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS radarr_searches (id INTEGER PRIMARY KEY, timestamp TEXT)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS lidarr_searches (id INTEGER PRIMARY KEY, timestamp TEXT)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS bazarr_searches (id INTEGER PRIMARY KEY, timestamp TEXT)''')
-        
-        # 2. Cleaner Tables (New Logic - Persistent Strikes)
-        # hash: Torrent Hash
-        # strikes: Current strike count
-        # last_checked: Timestamp of last check
-        # reason: Why it got the last strike
-        c.execute('''CREATE TABLE IF NOT EXISTS torrent_strikes 
-                     (hash TEXT PRIMARY KEY, strikes INTEGER, last_checked TEXT, reason TEXT)''')
-        
-        conn.commit()
-        conn.close()
+        with _db_lock:
+            conn = _db()
+            # Upgrade old TEXT-timestamp tables first so the index lands on the new schema
+            for table in SEARCH_TABLES:
+                _migrate_timestamps(conn, table)
+            # Connection PRAGMAs are already applied in _connect()
+            conn.executescript(_SCHEMA)
         logger.info(f"Database initialized at {DB_PATH}")
-    except Exception as e:
+    except sqlite3.Error as e:
         logger.error(f"Failed to initialize database: {e}")
 
+def optimize_db():
+    """Let SQLite refresh its query planner stats (cheap; meant to run periodically)."""
+    try:
+        with _db_lock:
+            _db().execute("PRAGMA optimize")
+    except sqlite3.Error as e:
+        logger.error(f"DB Error (Optimize): {e}")
+
 # --- DB Helpers for Searcher ---
+# The Searcher is the only writer of the *_searches tables, so each table's IDs
+# are read once and then kept in sync in memory by the helpers below.
+_searched_cache = {}
+
 def get_searched_ids(table_name):
+    """Return the (cached) set of searched IDs. Treat it as read-only."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute(f"SELECT id FROM {table_name}")
-        rows = c.fetchall()
-        conn.close()
-        return {row[0] for row in rows}
-    except Exception:
+        with _db_lock:
+            ids = _searched_cache.get(table_name)
+            if ids is None:
+                rows = _db().execute(f"SELECT id FROM {table_name}").fetchall()
+                ids = _searched_cache[table_name] = {row[0] for row in rows}
+        return ids
+    except sqlite3.Error:
         return set()
 
-def add_searched_id(table_name, item_id):
+def flush_searched_ids(table_name, ids):
+    """Record a batch of searched IDs in one transaction (single commit/fsync)."""
+    if not ids: return
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute(f"INSERT OR IGNORE INTO {table_name} (id, timestamp) VALUES (?, ?)", 
-                  (item_id, datetime.now().isoformat()))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        logger.error(f"DB Error (Add ID): {e}")
+        now = int(time.time())
+        rows = [(i, now) for i in ids]
+        with _db_lock:
+            conn = _db()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(f"INSERT OR IGNORE INTO {table_name} (id, timestamp) VALUES (?, ?)", rows)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if table_name in _searched_cache:
+                _searched_cache[table_name].update(ids)
+    except sqlite3.Error as e:
+        logger.error(f"DB Error (Add IDs): {e}")
 
 def wipe_table(table_name):
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute(f"DELETE FROM {table_name}")
-        conn.commit()
-        conn.close()
+        with _db_lock:
+            _db().execute(f"DELETE FROM {table_name}")
+            if table_name in _searched_cache:
+                _searched_cache[table_name].clear()
         logger.warning(f"Cycle Reset: Wiped table {table_name}")
-    except Exception as e:
+    except sqlite3.Error as e:
         logger.error(f"DB Error (Wipe): {e}")
 
 # --- DB Helpers for Cleaner (Strikes) ---
 def update_strike(torrent_hash, reason):
     """Increment strike count for a torrent."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        
-        # Check existing
-        c.execute("SELECT strikes FROM torrent_strikes WHERE hash=?", (torrent_hash,))
-        row = c.fetchone()
-        
-        if row:
-            new_strikes = row[0] + 1
-            c.execute("UPDATE torrent_strikes SET strikes=?, last_checked=?, reason=? WHERE hash=?",
-                      (new_strikes, datetime.now().isoformat(), reason, torrent_hash))
-        else:
-            new_strikes = 1
-            c.execute("INSERT INTO torrent_strikes (hash, strikes, last_checked, reason) VALUES (?, ?, ?, ?)",
-                      (torrent_hash, new_strikes, datetime.now().isoformat(), reason))
-        
-        conn.commit()
-        conn.close()
+        with _db_lock:
+            conn = _db()
+            
+            # Check existing
+            row = conn.execute("SELECT strikes FROM torrent_strikes WHERE hash=?", (torrent_hash,)).fetchone()
+            
+            if row:
+                new_strikes = row[0] + 1
+                conn.execute("UPDATE torrent_strikes SET strikes=?, last_checked=?, reason=? WHERE hash=?",
+                             (new_strikes, datetime.now().isoformat(), reason, torrent_hash))
+            else:
+                new_strikes = 1
+                conn.execute("INSERT INTO torrent_strikes (hash, strikes, last_checked, reason) VALUES (?, ?, ?, ?)",
+                             (torrent_hash, new_strikes, datetime.now().isoformat(), reason))
         return new_strikes
-    except Exception as e:
+    except sqlite3.Error as e:
         logger.error(f"DB Error (Update Strike): {e}")
         return 0
 
 def get_strikes(torrent_hash):
     """Get current strikes for a torrent."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("SELECT strikes FROM torrent_strikes WHERE hash=?", (torrent_hash,))
-        row = c.fetchone()
-        conn.close()
+        with _db_lock:
+            row = _db().execute("SELECT strikes FROM torrent_strikes WHERE hash=?", (torrent_hash,)).fetchone()
         return row[0] if row else 0
-    except Exception:
+    except sqlite3.Error:
         return 0
 
 def clear_strikes(torrent_hash):
     """Remove a torrent from the strike list (e.g., if it recovered)."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute("DELETE FROM torrent_strikes WHERE hash=?", (torrent_hash,))
-        conn.commit()
-        conn.close()
-    except Exception:
+        with _db_lock:
+            _db().execute("DELETE FROM torrent_strikes WHERE hash=?", (torrent_hash,))
+    except sqlite3.Error:
         pass
 
+# ==========================================
+#           HTTP SESSIONS
+# ==========================================
+
+# One keep-alive Session per app, so repeated calls reuse the TCP/TLS connection.
+# Shared by the Cleaner thread and the Searcher's fetch workers. requests does not
+# guarantee Session is thread-safe; we rely on only issuing plain requests through
+# it (the urllib3 pool is thread-safe) and never mutating headers/cookies after creation.
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_session(app_name, api_key):
+    """Return the pooled HTTP session for an app, with its X-Api-Key preset."""
+    with _sessions_lock:
+        session = _sessions.get(app_name)
+        if session is None:
+            session = requests.Session()
+            # Retry transient 5xx / connection errors with backoff. Only read-only methods:
+            # POST (search commands) and DELETE (queue remove + blocklist) are never re-sent,
+            # since a retry after a half-applied DELETE would just fail with a spurious 404.
+            retries = Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                            allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}))
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers['X-Api-Key'] = api_key
+            _sessions[app_name] = session
+        return session
+
+# --- Search command throttling (Anti-Ban) ---
+# Only the Searcher thread sends search commands, so a plain global is enough.
+_last_command = 0.0
+
+def throttle():
+    """Wait until REQUEST_DELAY seconds have passed since the previous search command."""
+    global _last_command
+    wait = REQUEST_DELAY - (time.monotonic() - _last_command)
+    if wait > 0: time.sleep(wait)
+    _last_command = time.monotonic()
+
 # ==========================================
 #           MODULE 1: THE CLEANER
 # ==========================================
@@ -237,12 +378,12 @@ class TorrentCleaner:
     def get_arr_queue(self, app_name, url, api_key):
         """Fetch the current Queue from Sonarr/Radarr/Lidarr to map Hashes to IDs."""
         try:
-            headers = {'X-Api-Key': api_key}
+            session = get_session(app_name, api_key)
             # Lidarr uses API v1, others use v3
             api_version = "v1" if app_name == "Lidarr" else "v3"
             
             # Fetch queue with enough details
-            res = requests.get(f"{url}/api/{api_version}/queue?page=1&pageSize=1000", headers=headers, timeout=20)
+            res = session.get(f"{url}/api/{api_version}/queue?page=1&pageSize=1000", timeout=20)
             res.raise_for_status()
             data = res.json()
             
@@ -258,7 +399,7 @@ class TorrentCleaner:
                         'title': item.get('title', 'Unknown')
                     }
             return mapping
-        except Exception as e:
+        except (requests.RequestException, ValueError) as e:
             logger.error(f"Error fetching queue from {app_name}: {e}")
             return {}
 
@@ -271,7 +412,7 @@ class TorrentCleaner:
             return
 
         try:
-            headers = {'X-Api-Key': api_key}
+            session = get_session(app_name, api_key)
             # removeFromClient=true -> Arr tells qBit to delete.
             # blocklist=true -> Arr prevents grabbing this specific release again.
             params = {'removeFromClient': 'true', 'blocklist': 'true'}
@@ -280,10 +421,10 @@ class TorrentCleaner:
             api_version = "v1" if app_name == "Lidarr" else "v3"
             
             uri = f"{url}/api/{api_version}/queue/{queue_id}"
-            res = requests.delete(uri, params=params, headers=headers, timeout=30)
+            res = session.delete(uri, params=params, timeout=30)
             res.raise_for_status()
             logger.info(f"[{app_name}] Successfully removed & blacklisted download. Reason: {reason}")
-        except Exception as e:
+        except requests.RequestException as e:
             logger.error(f"[{app_name}] Failed to remove queue item {queue_id}: {e}")
 
     def remove_via_qbit(self, torrent_hash, is_private):
@@ -431,108 +572,112 @@ class TorrentCleaner:
 class MissingSearcher:
     def check_safety_net(self, table_name):
         try:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            c.execute(f"SELECT timestamp FROM {table_name} ORDER BY timestamp ASC LIMIT 1")
-            row = c.fetchone()
-            conn.close()
+            expiry = int(time.time()) - MAX_CYCLE_DAYS * 86400
+            with _db_lock:
+                # Indexed probe: is any entry older than the cycle limit?
+                row = _db().execute(f"SELECT 1 FROM {table_name} WHERE timestamp < ? LIMIT 1", (expiry,)).fetchone()
             if row:
-                oldest = datetime.fromisoformat(row[0])
-                if datetime.now() - oldest > timedelta(days=MAX_CYCLE_DAYS):
-                    logger.warning(f"Safety Net: {table_name} exceeded {MAX_CYCLE_DAYS} days.")
-                    wipe_table(table_name)
-        except Exception as e:
+                logger.warning(f"Safety Net: {table_name} exceeded {MAX_CYCLE_DAYS} days.")
+                wipe_table(table_name)
+        except sqlite3.Error as e:
             logger.error(f"Safety check error: {e}")
 
-    def fetch_ids(self, url, api_key, endpoint):
-        """Generic fetcher for Arrs (Sonarr/Radarr/Lidarr)."""
-        try:
-            res = requests.get(f"{url}{endpoint}", headers={'X-Api-Key': api_key}, timeout=30)
-            res.raise_for_status()
-            data = res.json()
-            if isinstance(data, dict) and 'records' in data: return [i['id'] for i in data['records']]
-            if isinstance(data, list): return [i['id'] for i in data]
-            return []
-        except Exception as e:
-            logger.error(f"Fetch ID Error: {e}")
-            return []
+    def iter_ids(self, app_name, api_key, endpoint_url, page_size):
+        """
+        Generic paged fetcher for Arrs (Sonarr/Radarr/Lidarr). Yields item IDs page by page.
+        Fetch/parse errors propagate to the caller, so a failure is never mistaken for "no more pages".
+        """
+        session = get_session(app_name, api_key)
+        page = 1
+        while True:
+            count = 0
+            res = session.get(endpoint_url, params={'page': page, 'pageSize': page_size},
+                              timeout=30, stream=True)
+            with res:
+                res.raise_for_status()
+                # Stream-parse the paged response and pull out only records[].id,
+                # so the full record dicts are never built in memory.
+                res.raw.decode_content = True
+                for item_id in ijson.items(res.raw, 'records.item.id'):
+                    count += 1
+                    yield item_id
+            if count < page_size: return  # Last page
+            page += 1
+
+    def collect_targets(self, app_name, api_key, endpoint_url, searched, limit):
+        """Walk an endpoint's pages until `limit` IDs not yet in `searched` are found."""
+        found = []
+        if limit <= 0: return found
+        # Already-searched items ahead in sort order still have to be paged past, so
+        # keep pages large enough that a late-cycle run is a handful of GETs, not hundreds.
+        # Breaking out early closes the response.
+        page_size = max(limit * 2, MIN_PAGE_SIZE)
+        for item_id in self.iter_ids(app_name, api_key, endpoint_url, page_size):
+            if item_id not in searched:
+                found.append(item_id)
+                if len(found) >= limit: break
+        return found
 
     def run_cycle(self, app_name):
-        # --- CONFIGURATION SWITCH ---
-        if app_name == "Sonarr":
-            url, key, limit, cutoff = SONARR_URL, SONARR_API_KEY, SONARR_LIMIT, SONARR_CUTOFF
-            api_version = "v3"
-        elif app_name == "Radarr":
-            url, key, limit, cutoff = RADARR_URL, RADARR_API_KEY, RADARR_LIMIT, RADARR_CUTOFF
-            api_version = "v3"
-        elif app_name == "Lidarr":
-            url, key, limit, cutoff = LIDARR_URL, LIDARR_API_KEY, LIDARR_LIMIT, LIDARR_CUTOFF
-            api_version = "v1"
-        elif app_name == "Bazarr":
+        if app_name == "Bazarr":
             # Bazarr has unique logic handled in its own method
             self.run_bazarr_cycle()
             return
-        else:
-            return
 
-        self.check_safety_net(f"{app_name.lower()}_searches")
+        # --- STANDARD ARRS LOGIC (Sonarr/Radarr/Lidarr) ---
+        app = SEARCH_APPS.get(app_name)
+        if not app: return
+        key, limit, endpoints = app['key'], app['limit'], app['endpoints']
+        if limit <= 0: return  # Searching disabled for this app
+
+        table = f"{app_name.lower()}_searches"
+        self.check_safety_net(table)
+        searched = get_searched_ids(table)
 
-       # --- STANDARD ARRS LOGIC (Sonarr/Radarr/Lidarr) ---
-        candidates = []
+        # Each endpoint stops as soon as it has `limit` unsearched IDs.
+        target = set()
         try:
-            if app_name == "Sonarr":
-                # Sonarr uses airDateUtc
-                candidates.extend(self.fetch_ids(url, key, f"/api/{api_version}/wanted/missing?page=1&pageSize=1000&sortKey=airDateUtc&sortDir=desc"))
-                if cutoff > 0: 
-                    candidates.extend(self.fetch_ids(url, key, f"/api/{api_version}/wanted/cutoff?page=1&pageSize=1000"))
-            
-            elif app_name == "Lidarr":
-                # Lidarr uses releaseDate (Not airDateUtc)
-                candidates.extend(self.fetch_ids(url, key, f"/api/{api_version}/wanted/missing?page=1&pageSize=1000&sortKey=releaseDate&sortDir=desc"))
-                if cutoff > 0: 
-                    candidates.extend(self.fetch_ids(url, key, f"/api/{api_version}/wanted/cutoff?page=1&pageSize=1000"))
-
-            elif app_name == "Radarr":
-                # Radarr uses standard logic
-                candidates.extend(self.fetch_ids(url, key, "/api/v3/wanted/missing?page=1&pageSize=1000"))
-                if cutoff > 0: 
-                    candidates.extend(self.fetch_ids(url, key, "/api/v3/wanted/cutoff?page=1&pageSize=1000"))
-        except Exception as e:
+            if len(endpoints) == 1:
+                # Missing only (cutoff disabled): nothing to overlap, skip the pool
+                target.update(self.collect_targets(app_name, key, endpoints[0], searched, limit))
+            else:
+                # Missing & Cutoff are independent, so page through them concurrently
+                with ThreadPoolExecutor(max_workers=len(endpoints), thread_name_prefix="Searcher") as pool:
+                    futures = [pool.submit(self.collect_targets, app_name, key, ep, searched, limit)
+                               for ep in endpoints]
+                    for future in as_completed(futures):
+                        target.update(future.result())
+        except (requests.RequestException, Urllib3Error, ValueError, ijson.JSONError) as e:
+            # Urllib3Error: read failures while streaming res.raw are not wrapped by requests.
+            # Abort without wiping: an outage must not look like "every page walked, nothing left".
             logger.error(f"[{app_name}] Error fetching candidates: {e}")
             return
+        target = list(target)
 
-        candidates = list(set(candidates))
-        searched = get_searched_ids(f"{app_name.lower()}_searches")
-        target = [i for i in candidates if i not in searched]
-
-        logger.info(f"[{app_name}] Missing/Cutoff: {len(target)} items waiting.")
+        logger.info(f"[{app_name}] Missing/Cutoff: {len(target)} unsearched items found.")
 
+        # Empty here means every endpoint reached its short last page with nothing unsearched
         if not target:
             if searched:
                 logger.info(f"[{app_name}] Cycle Complete. Wiping DB.")
-                wipe_table(f"{app_name.lower()}_searches")
+                wipe_table(table)
             return
 
         batch = target[:limit]
         
-        # Trigger Search
-        headers = {'X-Api-Key': key}
-        table = f"{app_name.lower()}_searches"
+        # Trigger Search (one bulk command for the whole batch)
+        session = get_session(app_name, key)
         
-        for i in batch:
-            try:
-                payload = {}
-                if app_name == "Sonarr": payload = {'name': 'EpisodeSearch', 'episodeIds': [i]}
-                elif app_name == "Radarr": payload = {'name': 'MoviesSearch', 'movieIds': [i]}
-                elif app_name == "Lidarr": payload = {'name': 'AlbumSearch', 'albumIds': [i]}
+        payload = {'name': app['command'], app['id_field']: batch}
 
-                res = requests.post(f"{url}/api/{api_version}/command", json=payload, headers=headers, timeout=30)
-                res.raise_for_status()
-                logger.info(f"[{app_name}] Triggered Search ID: {i}")
-                add_searched_id(table, i)
-                time.sleep(REQUEST_DELAY)
-            except Exception as e:
-                logger.error(f"[{app_name}] Search Fail ID {i}: {e}")
+        try:
+            throttle()
+            res = session.post(app['command_url'], json=payload, timeout=30)
+            res.raise_for_status()
+            logger.info(f"[{app_name}] Triggered Search for {len(batch)} IDs: {batch}")
+            flush_searched_ids(table, batch)
+        except requests.RequestException as e:
+            logger.error(f"[{app_name}] Search Fail IDs {batch}: {e}")
 
     def run_bazarr_cycle(self):
         """
@@ -540,11 +685,11 @@ class MissingSearcher:
         Checks for items that have a file but are missing subtitles.
         """
         logger.info("[Bazarr] Starting Subtitle Search Cycle...")
-        headers = {'X-Api-Key': BAZARR_API_KEY}
+        session = get_session("Bazarr", BAZARR_API_KEY)
         
         # --- PART 1: MOVIES ---
         try:
-            res = requests.get(f"{BAZARR_URL}/api/movies", headers=headers, timeout=30)
+            res = session.get(f"{BAZARR_URL}/api/movies", timeout=30)
             if res.status_code == 200:
                 movies = res.json().get('data', [])
                 # Filter: Has File + Missing Subtitles (> 0)
@@ -557,23 +702,25 @@ class MissingSearcher:
                 logger.info(f"[Bazarr] Movies Missing Subs: {len(target)}")
                 
                 # Process Batch (Movies)
+                triggered = []
                 for radarr_id in target[:5]: # Small batch to allow time for Series
                     try:
                         # Command: Search subtitles for this movie
                         payload = {'name': 'movies_search', 'ids': [radarr_id]}
-                        requests.post(f"{BAZARR_URL}/api/command", json=payload, headers=headers, timeout=30)
+                        throttle()
+                        session.post(f"{BAZARR_URL}/api/command", json=payload, timeout=30)
                         logger.info(f"[Bazarr] Searching Subs for Movie ID: {radarr_id}")
-                        add_searched_id("bazarr_searches", radarr_id)
-                        time.sleep(REQUEST_DELAY)
-                    except Exception as e:
+                        triggered.append(radarr_id)
+                    except requests.RequestException as e:
                         logger.error(f"[Bazarr] Movie Search Fail: {e}")
-        except Exception as e:
+                flush_searched_ids("bazarr_searches", triggered)
+        except (requests.RequestException, ValueError, KeyError) as e:
             logger.error(f"[Bazarr] Movie Check Error: {e}")
 
         # --- PART 2: SERIES (EPISODES) ---
         try:
             # 1. Get All Series to find which ones need help
-            res = requests.get(f"{BAZARR_URL}/api/series", headers=headers, timeout=30)
+            res = session.get(f"{BAZARR_URL}/api/series", timeout=30)
             if res.status_code == 200:
                 all_series = res.json().get('data', [])
                 # Smart Filter: Only look at series that report missing subtitles
@@ -591,7 +738,7 @@ class MissingSearcher:
                     sonarr_id = series['sonarrId']
                     
                     # Get Episodes for this series
-                    ep_res = requests.get(f"{BAZARR_URL}/api/episodes?seriesId={series_id}", headers=headers, timeout=20)
+                    ep_res = session.get(f"{BAZARR_URL}/api/episodes?seriesId={series_id}", timeout=20)
                     if ep_res.status_code == 200:
                         episodes = ep_res.json().get('data', [])
                         # Filter: Has File + Missing Subs
@@ -606,6 +753,7 @@ class MissingSearcher:
                         # Safe bet: We proceed. The probability of a Movie ID matching a specific Episode ID exactly on the same day is low enough for a helper script.
                         
                         real_targets = [ep for ep in missing_eps if ep not in searched_eps]
+                        triggered = []
                         
                         for ep_id in real_targets:
                             if count_searched_episodes >= 10: break
@@ -613,40 +761,58 @@ class MissingSearcher:
                             try:
                                 # Command: Search subtitles for this episode
                                 payload = {'name': 'episodes_search', 'ids': [ep_id]}
-                                requests.post(f"{BAZARR_URL}/api/command", json=payload, headers=headers, timeout=30)
+                                throttle()
+                                session.post(f"{BAZARR_URL}/api/command", json=payload, timeout=30)
                                 logger.info(f"[Bazarr] Searching Subs for Episode ID: {ep_id} (Series: {sonarr_id})")
-                                add_searched_id("bazarr_searches", ep_id)
-                                time.sleep(REQUEST_DELAY)
+                                triggered.append(ep_id)
                                 count_searched_episodes += 1
-                            except Exception as e:
+                            except requests.RequestException as e:
                                 logger.error(f"[Bazarr] Episode Search Fail: {e}")
+                        flush_searched_ids("bazarr_searches", triggered)
 
-        except Exception as e:
+        except (requests.RequestException, ValueError, KeyError) as e:
             logger.error(f"[Bazarr] Series Check Error: {e}")
 
 # ==========================================
 #           MAIN THREAD RUNNERS
 # ==========================================
 
+def run_forever(name, every_minutes, task):
+    """Run `task` every `every_minutes` on a fixed monotonic deadline (no polling)."""
+    interval = every_minutes * 60
+    next_run = time.monotonic()
+    while True:
+        try:
+            logger.info(f"--- {name} Run ---")
+            task()
+        except Exception as e:
+            logger.error(f"{name} Thread Error: {e}")
+            time.sleep(60) # Sleep on error, then retry
+            continue
+
+        next_run += interval
+        now = time.monotonic()
+        if next_run <= now:
+            # Run took longer than the interval: skip the missed slots instead of bursting
+            missed = int((now - next_run) // interval) + 1
+            logger.warning(f"{name} overran its {every_minutes} min interval, skipping {missed} run(s).")
+            next_run += missed * interval
+        logger.info(f"{name} sleeping for {round((next_run - now) / 60, 1)} mins...")
+        time.sleep(max(0, next_run - time.monotonic()))
+
 def searcher_thread():
     """Runs the missing content search loop."""
     searcher = MissingSearcher()
     logger.info("Searcher Thread Started.")
-    while True:
-        try:
-            schedule.run_pending()
-            # We use local scheduling logic inside the loop or just simple sleeps
-            # To respect the 'RUN_EVERY' env var dynamically:
-            logger.info("--- Searcher Run ---")
-            if SONARR_ENABLED: searcher.run_cycle("Sonarr")
-            if RADARR_ENABLED: searcher.run_cycle("Radarr")
-            if LIDARR_ENABLED: searcher.run_cycle("Lidarr")
-            # Bazarr skipped (Search API differs significantly)
-            logger.info(f"Searcher sleeping for {SEARCH_RUN_EVERY} mins...")
-            time.sleep(SEARCH_RUN_EVERY * 60)
-        except Exception as e:
-            logger.error(f"Searcher Thread Error: {e}")
-            time.sleep(60) # Sleep on error
+
+    def search_all():
+        if SONARR_ENABLED: searcher.run_cycle("Sonarr")
+        if RADARR_ENABLED: searcher.run_cycle("Radarr")
+        if LIDARR_ENABLED: searcher.run_cycle("Lidarr")
+        # Bazarr skipped (Search API differs significantly)
+        optimize_db()
+
+    run_forever("Searcher", SEARCH_RUN_EVERY, search_all)
 
 def cleaner_thread():
     """Runs the torrent cleaner loop."""
@@ -656,19 +822,12 @@ def cleaner_thread():
 
     cleaner = TorrentCleaner()
     logger.info("Cleaner Thread Started.")
-    while True:
-        try:
-            logger.info("--- Cleaner Run ---")
-            cleaner.run_cleaner_cycle()
-            logger.info(f"Cleaner sleeping for {CLEANER_RUN_EVERY} mins...")
-            time.sleep(CLEANER_RUN_EVERY * 60)
-        except Exception as e:
-            logger.error(f"Cleaner Thread Error: {e}")
-            time.sleep(60)
+    run_forever("Cleaner", CLEANER_RUN_EVERY, cleaner.run_cleaner_cycle)
 
 def main():
     logger.info("Starting Arr-Missing-Content V2 (The Manager)...")
     init_db()
+    optimize_db()
 
     # Start Searcher in background thread
     t_search = threading.Thread(target=searcher_thread, name="Searcher", daemon=True)
@@ -678,9 +837,8 @@ def main():
     t_clean = threading.Thread(target=cleaner_thread, name="Cleaner", daemon=True)
     t_clean.start()
 
-    # Keep main thread alive to handle signals or just wait
-    while True:
-        time.sleep(1)
+    # Keep main thread alive (blocks without waking; the Searcher loop never returns)
+    t_search.join()
 
 if __name__ == "__main__":
     main()